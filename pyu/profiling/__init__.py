@@ -1,4 +1,4 @@
 from .memory import lmem, mem
-from .time import ltimer, timer
+from .time import ftimer, ltimer, timer
 
-__all__ = ["lmem", "mem", "ltimer", "timer"]
+__all__ = ["lmem", "mem", "ftimer", "ltimer", "timer"]
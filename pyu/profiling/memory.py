@@ -6,16 +6,86 @@ Memory profiling utilities.
 """
 
 __all__ = ["mem", "lmem"]
-import linecache
+import inspect
 import sys
 import threading
 import tracemalloc
 from collections import defaultdict
+from contextvars import ContextVar
 from functools import wraps
 from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from .stats import Stats
-from .writing import MemoryWriter
+from .writing import MemoryWriter, line_stats
+
+# Code ids of functions currently profiled by mem in this context, used
+# to let recursive calls run untraced
+_mem_running: ContextVar = ContextVar("_mem_running", default=())
+
+
+def _reset_traced_memory() -> None:
+    """Forget earlier allocations so the next peak covers a single run."""
+    if hasattr(tracemalloc, "reset_peak"):
+        tracemalloc.clear_traces()
+        tracemalloc.reset_peak()
+    else:
+        # Python 3.8 has no reset_peak, restarting is the only way
+        tracemalloc.stop()
+        tracemalloc.start()
+
+
+def _line_memory_tracers(
+    root_file: str,
+    line_mem: Dict[int, List[float]],
+    state: list,
+) -> Tuple[Callable, Callable]:
+    """
+    Build the ``sys.settrace`` callbacks used by ``lmem``.
+
+    Only lines of ``root_file`` are traced, so measurements are keyed by
+    line number alone and no tuple is built per event.
+    ``state`` holds the previous line and the peak memory when it started.
+    It is shared with the caller, which closes the last line on stop. It
+    starts on the ``with`` line, which is left out of the report, so the
+    callback records every event without checking for a first one.
+    """
+
+    # Everything the line callback touches is bound as a default argument
+    # so each lookup is a LOAD_FAST
+    def _trace_lines(
+        frame,
+        event: str,
+        arg,
+        _bucket=line_mem.__getitem__,
+        _get_traced_memory=tracemalloc.get_traced_memory,
+        _state=state,
+    ):
+        if event != "line":
+            return _trace_lines
+        peak = _get_traced_memory()[1]
+        _bucket(_state[0]).append(peak - _state[1])
+        _state[0] = frame.f_lineno
+        _state[1] = peak
+        return _trace_lines
+
+    def _trace_calls(frame, event: str, arg, _root_file=root_file):
+        # Frames from other files are rejected once, on call
+        if frame.f_code.co_filename != _root_file:
+            return None
+        return _trace_lines
+
+    return _trace_lines, _trace_calls
+
+
+def _root_file_lines(
+    root_file: str, line_mem: Dict[int, List[float]], with_line: int
+) -> Dict[Tuple[str, int], List[float]]:
+    """Key measurements by (file, line), leaving out the ``with`` line."""
+    return {
+        (root_file, lineno): usages
+        for lineno, usages in line_mem.items()
+        if lineno != with_line
+    }
 
 
 class mem:
@@ -28,45 +98,44 @@ class mem:
         Peak memory usage recorded during the profiling session.
     """
 
-    _tracker: threading.local
     repeat: int
     out: Any
+    append_mode: bool
     usage: Stats
 
-    def __init__(self, *, repeat: int = 1, out: Any = None):
-        self._tracker = threading.local()
-        self._tracker.running: set[Callable] = set()
+    def __init__(
+        self, *, repeat: int = 1, out: Any = None, append_mode: bool = False
+    ):
         self.repeat = repeat
         self.out = out
+        self.append_mode = append_mode
 
     def __call__(self, func: Optional[Callable] = None) -> Callable:
         """Decorator for measuring memory usage of a function."""
-        _mem_usages = []
+        _mem_usages = Stats()
         if self.repeat < 1:
             raise ValueError("Repeat must be at least 1.")
+        _key = id(getattr(func, "__code__", func))
+        _writer = MemoryWriter(self.out, append_mode=self.append_mode)
 
         @wraps(func)
         def wrapper(*args, **kwargs):
-            if (
-                hasattr(self._tracker, "running")
-                and func in self._tracker.running
-            ):
+            running = _mem_running.get()
+            if _key in running:
                 return func(*args, **kwargs)
+            token = _mem_running.set(running + (_key,))
             try:
-                self._tracker.running.add(func)
                 result = None
+                tracemalloc.start()
                 for _ in range(self.repeat):
-                    tracemalloc.start()
+                    _reset_traced_memory()
                     result = func(*args, **kwargs)
-                    _, peak = tracemalloc.get_traced_memory()
-                    _mem_usages.append(peak)
-                    tracemalloc.stop()
+                    _mem_usages.add(tracemalloc.get_traced_memory()[1])
             finally:
-                self._tracker.running.remove(func)
-                self.usage = Stats(_mem_usages)
-                MemoryWriter(self.out).with_func(func, *args, **kwargs).write(
-                    _mem_usages
-                )
+                tracemalloc.stop()
+                _mem_running.reset(token)
+                self.usage = _mem_usages
+                _writer.with_func(func, *args, **kwargs).write(_mem_usages)
             return result
 
         return wrapper
@@ -83,18 +152,22 @@ class mem:
         peak = tracemalloc.get_traced_memory()[1]
         tracemalloc.stop()
         self.usage = Stats([peak])
-        MemoryWriter(output_target=self.out).write([peak])
+        MemoryWriter(
+            output_target=self.out, append_mode=self.append_mode
+        ).write([peak])
 
 
 class lmem:
     _tracker: threading.local
     out: Any
+    append_mode: bool
     usage: Dict[Tuple[str, int, str], Stats]
 
-    def __init__(self, *, out: Any = None):
+    def __init__(self, *, out: Any = None, append_mode: bool = False):
         self._tracker = threading.local()
         self._tracker.running: set[Callable] = set()
         self.out = out
+        self.append_mode = append_mode
 
     def __call__(
         self, func: Optional[Callable] = None, out: Any = None
@@ -103,67 +176,40 @@ class lmem:
         _mem_usages = []
         if func is None:
             raise ValueError("Function to be decorated must not be None.")
+        _writer = MemoryWriter(
+            self.out if out is None else out, append_mode=self.append_mode
+        )
+        # Resolved once here rather than by walking frames on every call
+        _code = getattr(inspect.unwrap(func), "__code__", None)
+        _root_file = None if _code is None else _code.co_filename
 
         @wraps(func)
         def wrapper(*args, **kwargs):
-            _line_mem: Dict[int, List[float]] = defaultdict(list)
-            _org_trace = sys.gettrace()
-            _root_frame = sys._getframe(1)
-            _root_file = _root_frame.f_code.co_filename
-            _prev_line = None
-            _prev_peak_mem = tracemalloc.get_traced_memory()[1]
-            _last_line = None
-            _with_line = _root_frame.f_lineno
-
-            def _trace(frame, event: str, arg):
-                nonlocal _prev_line, _prev_peak_mem, _last_line
-                if event != "line":
-                    return _trace
-
-                current_file = frame.f_code.co_filename
-                if current_file != _root_file:
-                    return _trace
-                _, peak = tracemalloc.get_traced_memory()
-                if _prev_line is not None:
-                    _line_mem[_prev_line].append(peak - _prev_peak_mem)
-
-                filename = frame.f_code.co_filename
-                lineno = frame.f_lineno
-                _prev_line = (filename, lineno)
-                _prev_peak_mem = peak
-                return _trace
-
             if func in self._tracker.running:
                 return func(*args, **kwargs)
+            _line_mem: Dict[int, List[float]] = defaultdict(list)
+            _org_trace = sys.gettrace()
+            # A decorated function has no ``with`` line; 0 marks the time
+            # before its first line, which is left out like one
+            _, _trace_calls = _line_memory_tracers(
+                _root_file,
+                _line_mem,
+                [0, tracemalloc.get_traced_memory()[1]],
+            )
             try:
                 self._tracker.running.add(func)
-                _root_frame.f_trace = _trace
-                sys.settrace(_trace)
+                sys.settrace(_trace_calls)
                 tracemalloc.start()
                 result = func(*args, **kwargs)
                 _, peak = tracemalloc.get_traced_memory()
                 _mem_usages.append(peak)
             finally:
-                tracemalloc.stop()
                 sys.settrace(_org_trace)
+                tracemalloc.stop()
                 self._tracker.running.remove(func)
-                _line_mem = dict(
-                    filter(
-                        lambda item: item[0][1] != _with_line,
-                        _line_mem.items(),
-                    )
-                )
-                self.usage = {
-                    (
-                        linecache.getline(filename, lineno).strip(),
-                        lineno,
-                        filename,
-                    ): Stats(usages)
-                    for (filename, lineno), usages in _line_mem.items()
-                }
-                MemoryWriter(out).with_func(func, *args, **kwargs).write(
-                    _mem_usages
-                )
+                _line_mem = _root_file_lines(_root_file, _line_mem, 0)
+                self.usage = line_stats(_line_mem)
+                _writer.with_func(func, *args, **kwargs).write(_mem_usages)
             return result
 
         return wrapper
@@ -172,54 +218,32 @@ class lmem:
         self._line_mem: Dict[int, List[float]] = defaultdict(list)
         self._org_trace = sys.gettrace()
         self._root_frame = sys._getframe(1)
+        self._org_frame_trace = self._root_frame.f_trace
         self._root_file = self._root_frame.f_code.co_filename
-        self._prev_line = None
-        self._prev_peak_mem = tracemalloc.get_traced_memory()[1]
-        self._last_line = None
         self._with_line = self._root_frame.f_lineno
+        # [previous line, peak memory when it started]
+        self._state = [self._with_line, tracemalloc.get_traced_memory()[1]]
+        _trace_lines, _trace_calls = _line_memory_tracers(
+            self._root_file, self._line_mem, self._state
+        )
 
-        def _trace(frame, event: str, arg):
-            if event != "line":
-                return _trace
-
-            current_file = frame.f_code.co_filename
-            if current_file != self._root_file:
-                return _trace
-            _, peak = tracemalloc.get_traced_memory()
-            if self._prev_line is not None:
-                self._line_mem[self._prev_line].append(
-                    peak - self._prev_peak_mem
-                )
-
-            filename = frame.f_code.co_filename
-            lineno = frame.f_lineno
-            self._prev_line = (filename, lineno)
-            self._prev_peak_mem = peak
-            return _trace
-
-        self._root_frame.f_trace = _trace
-        sys.settrace(_trace)
+        self._root_frame.f_trace = _trace_lines
+        sys.settrace(_trace_calls)
         tracemalloc.start()
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
-        if self._prev_line is not None:
-            peak = tracemalloc.get_traced_memory()[1]
-            self._line_mem[self._prev_line].append(peak - self._prev_peak_mem)
+        sys.settrace(self._org_trace)
+        self._root_frame.f_trace = self._org_frame_trace
+        self._root_frame = None
+        prev_line, prev_peak_mem = self._state
+        peak = tracemalloc.get_traced_memory()[1]
+        self._line_mem[prev_line].append(peak - prev_peak_mem)
         tracemalloc.stop()
-        self._line_mem = dict(
-            filter(
-                lambda item: item[0][1] != self._with_line,
-                self._line_mem.items(),
-            )
+        self._line_mem = _root_file_lines(
+            self._root_file, self._line_mem, self._with_line
+        )
+        self.usage = line_stats(self._line_mem)
+        MemoryWriter(self.out, append_mode=self.append_mode).write(
+            self._line_mem, root_file=self._root_file
         )
-        self.usage = {
-            (
-                linecache.getline(filename, lineno).strip(),
-                lineno,
-                filename,
-            ): Stats(usages)
-            for (filename, lineno), usages in self._line_mem.items()
-        }
-        MemoryWriter(self.out).write(self._line_mem, root_file=self._root_file)
-        sys.settrace(self._org_trace)
@@ -4,20 +4,100 @@ Profiling statistics utilities.
 @author: Jakub Walczak
 """
 
+import math
+import operator
 from functools import cached_property
+from itertools import repeat
 from numbers import Number
-from typing import List
+from typing import Iterable, Iterator, List, Optional
+
+
+def sum_squared_deviations(values: List[Number], mean: float) -> float:
+    """Sum of squared deviations from mean, computed in C builtins."""
+    centred = list(map(operator.sub, values, repeat(mean, len(values))))
+    if hasattr(math, "sumprod"):
+        # Python 3.12+: one C loop, no list of squares
+        return math.sumprod(centred, centred)
+    return sum(map(operator.mul, centred, centred))
 
 
 class Stats:
-    """Compute basic statistics for a list of numbers."""
+    """
+    Compute basic statistics for a list of numbers.
 
-    def __init__(self, values: List[Number]):
-        self.values = values
+    Count, sum, mean, variance and extremes are kept up to date by
+    ``add`` using Welford's online algorithm, so a profiler can record
+    one value per run without a second pass over the data at report time.
+    """
 
-    @cached_property
+    def __init__(self, values: Optional[Iterable[Number]] = None):
+        # Copied, so recording more values never mutates the caller's list
+        self.values = [] if values is None else list(values)
+        self.count = len(self.values)
+        # Exact rounding, so the mean of many small timings does not drift
+        self.sum = math.fsum(self.values)
+        self._mean = self.sum / self.count if self.count else 0.0
+        self._m2 = (
+            sum_squared_deviations(self.values, self._mean)
+            if self.count > 1
+            else 0.0
+        )
+        self.min = min(self.values) if self.values else None
+        self.max = max(self.values) if self.values else None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[Number]:
+        return iter(self.values)
+
+    def __getitem__(self, index):
+        return self.values[index]
+
+    def add(self, value: Number) -> None:
+        """Record a single value and update the running statistics."""
+        self.values.append(value)
+        self.count += 1
+        self.sum += value
+        delta = value - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (value - self._mean)
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        self._clear_order_statistics()
+
+    def extend(self, values: Iterable[Number]) -> None:
+        """
+        Record many values at once. Their moments are computed in bulk and
+        merged with the running ones (Chan et al.'s parallel update).
+        """
+        other = Stats(values)
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other._mean - self._mean
+        self._mean += delta * other.count / count
+        self._m2 += (
+            other._m2 + delta * delta * self.count * other.count / count
+        )
+        self.values.extend(other.values)
+        self.count = count
+        self.sum += other.sum
+        if self.min is None or other.min < self.min:
+            self.min = other.min
+        if self.max is None or other.max > self.max:
+            self.max = other.max
+        self._clear_order_statistics()
+
+    def _clear_order_statistics(self) -> None:
+        for name in ("sorted_values", "median", "mode"):
+            self.__dict__.pop(name, None)
+
+    @property
     def mean(self) -> float:
-        return sum(self.values) / len(self.values)
+        return self._mean
 
     @cached_property
     def sorted_values(self) -> List[float]:
@@ -33,15 +113,25 @@ class Stats:
             else sorted_values[mid]
         )
 
+    def quantile(self, q: float) -> float:
+        """
+        Value below which a fraction ``q`` of the data lies, linearly
+        interpolated between the closest ranks.
+        """
+        sorted_values = self.sorted_values
+        position = q * (len(sorted_values) - 1)
+        lower = int(position)
+        upper = min(lower + 1, len(sorted_values) - 1)
+        return sorted_values[lower] + (
+            sorted_values[upper] - sorted_values[lower]
+        ) * (position - lower)
+
     @cached_property
     def mode(self) -> float:
         return max(set(self.values), key=self.values.count)
 
-    @cached_property
+    @property
     def stddev(self) -> float:
-        if len(self.values) < 2:
+        if self.count < 2:
             return 0.0
-        mean = self.mean
-        return (
-            sum((x - mean) ** 2 for x in self.values) / (len(self.values) - 1)
-        ) ** 0.5
+        return (self._m2 / (self.count - 1)) ** 0.5
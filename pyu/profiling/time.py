@@ -5,17 +5,31 @@ Time profiling utilities.
 @organization: HappyRavenLabs
 """
 
-__all__ = ["timer", "ltimer"]
-import linecache
+__all__ = ["timer", "ltimer", "ftimer"]
+import inspect
 import sys
 import threading
 import time
 from collections import defaultdict
-from functools import wraps
+from contextvars import ContextVar
+from functools import partial, wraps
+from types import (
+    BuiltinFunctionType,
+    CodeType,
+    FrameType,
+    MethodDescriptorType,
+    MethodWrapperType,
+    WrapperDescriptorType,
+)
 from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
 from .stats import Stats
-from .writing import ReportConfig, TimeWriter
+from .writing import ReportConfig, TimeWriter, line_stats
+
+
+def _ns_to_seconds(samples: List[int]) -> List[float]:
+    """Convert integer nanosecond samples to seconds"""
+    return [ns / 1e9 for ns in samples]
 
 
 class timer:
@@ -23,48 +37,67 @@ class timer:
     repeat: int
     out: Any
     precision: int
+    append_mode: bool
     stats: Stats
 
     def __init__(
-        self, *, repeat: int = 1, out: Any = None, precision: int = 4
+        self,
+        *,
+        repeat: int = 1,
+        out: Any = None,
+        precision: int = 4,
+        append_mode: bool = False,
     ):
         self._tracker = threading.local()
         self._tracker.running: Set[Callable] = set()
         self.repeat = repeat
         self.out = out
         self.precision = precision
+        self.append_mode = append_mode
 
     def __call__(
         self,
         func: Optional[Callable] = None,
     ) -> Callable:
         """Decorator for measuring execution time of a function."""
-        _times: List[float] = []
-        if self.repeat < 1:
+        _times = Stats()
+        _repeat = self.repeat
+        if _repeat < 1:
             raise ValueError("Repeat must be at least 1.")
+        _writer = TimeWriter(
+            self.out,
+            config=ReportConfig(precision=self.precision),
+            append_mode=self.append_mode,
+        )
 
         @wraps(func)
         def wrapper(*args, **kwargs):
-
-            if func in self._tracker.running:
+            running = self._tracker.running
+            if func in running:
                 return func(*args, **kwargs)
+            # Filled by index in nanoseconds, then merged into the stats
+            # once all runs are done
+            samples = [None] * _repeat
             try:
-                self._tracker.running.add(func)
-                for _ in range(self.repeat):
-                    start_time = time.perf_counter()
+                running.add(func)
+                perf_counter = time.perf_counter_ns
+                for i in range(_repeat):
+                    start_time = perf_counter()
                     result = func(*args, **kwargs)
-                    _times.append(time.perf_counter() - start_time)
+                    samples[i] = perf_counter() - start_time
                 return result
             finally:
-                if not _times:
-                    _times.append(time.perf_counter() - start_time)
-
-                self.stats = Stats(_times)
-                TimeWriter(
-                    self.out, config=ReportConfig(precision=self.precision)
-                ).with_func(func, *args, **kwargs).write(_times)
-                if func in self._tracker.running:
-                    self._tracker.running.remove(func)
+                if samples[-1] is None:
+                    # Drop the run that raised and those never started
+                    completed = samples.index(None)
+                    del samples[completed:]
+                if not samples:
+                    samples.append(time.perf_counter_ns() - start_time)
+                _times.extend(_ns_to_seconds(samples))
+
+                self.stats = _times
+                _writer.with_func(func, *args, **kwargs).write(_times)
+                running.discard(func)
 
         return wrapper
 
@@ -73,34 +106,280 @@ class timer:
             raise ValueError(
                 "Repeat must be 1 when used as a context manager."
             )
-        self._start_time: float = time.perf_counter()
+        self._start_time: int = time.perf_counter_ns()
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
-        _end_time: float = time.perf_counter()
-        self.stats = Stats([_end_time - self._start_time])
+        elapsed = (time.perf_counter_ns() - self._start_time) / 1e9
+        self.stats = Stats([elapsed])
         TimeWriter(
-            self.out, config=ReportConfig(precision=self.precision)
-        ).write([_end_time - self._start_time])
+            self.out,
+            config=ReportConfig(precision=self.precision),
+            append_mode=self.append_mode,
+        ).write([elapsed])
+
+
+_MONITORING = sys.version_info >= (3, 12)
+
+
+class _LineTracer:
+    """
+    Collects the time spent on each line of the root code object.
+
+    On Python 3.12+ the ``sys.monitoring`` LINE event is enabled locally
+    for ``root_code`` only, so the interpreter never dispatches the
+    callback for any other code object. Those events fire in every
+    thread, so the callback ignores threads other than the one that
+    started tracing. Older interpreters fall back to ``sys.settrace``,
+    which is per thread already.
+
+    ``root_frame`` is only given for the context manager: it is the frame
+    already running the ``with`` block, and its ``with`` line is left out
+    of the report. Decorated functions start in a fresh frame and need
+    only their code.
+
+    Every sample is a line number and a nanosecond delta appended to two
+    flat lists; they are grouped per line only in ``stop``. Only lines
+    of the root code are traced, so the line number alone is the key.
+    """
+
+    root_file: str
+
+    def __init__(
+        self, root_code: CodeType, root_frame: Optional[FrameType] = None
+    ):
+        self.root_file = root_code.co_filename
+        self._root_code = root_code
+        # Plain lists: appending to an array.array converts every value to
+        # a C integer and costs about three times as much per event
+        self._linenos = []
+        self._deltas = []
+        self._root_frame = root_frame
+        # Line 0 stands in for the call of a decorated function
+        self._with_line = 0 if root_frame is None else root_frame.f_lineno
+        # [previous line, its start time], shared with the callbacks. It
+        # starts on the excluded line, so the callbacks record every event
+        # without checking for a first one
+        self._state = [self._with_line, 0]
+        self._tool_id = None
+        self._org_trace = None
+        self._org_frame_trace = None
+
+    def start(self) -> None:
+        self._state[1] = time.perf_counter_ns()
+        if _MONITORING and self._start_monitoring():
+            return
+        self._start_settrace()
+
+    def stop(self) -> Dict[Tuple[str, int], List[float]]:
+        """Stop tracing and return line times in seconds."""
+        end_time = time.perf_counter_ns()
+        if self._tool_id is not None:
+            monitoring = sys.monitoring
+            monitoring.set_local_events(
+                self._tool_id, self._root_code, monitoring.events.NO_EVENTS
+            )
+            monitoring.register_callback(
+                self._tool_id, monitoring.events.LINE, None
+            )
+            monitoring.free_tool_id(self._tool_id)
+            self._tool_id = None
+        else:
+            sys.settrace(self._org_trace)
+            if self._root_frame is not None:
+                # Left in place, our callback would be called again by
+                # the next tracer installed, e.g. a debugger
+                self._root_frame.f_trace = self._org_frame_trace
+        self._root_frame = None
+        prev_line, prev_time = self._state
+        self._linenos.append(prev_line)
+        self._deltas.append(end_time - prev_time)
+        line_time = defaultdict(list)
+        for lineno, delta in zip(self._linenos, self._deltas):
+            line_time[lineno].append(delta)
+        del line_time[self._with_line]
+        # Samples are kept in integer nanoseconds while tracing
+        return {
+            (self.root_file, lineno): _ns_to_seconds(times)
+            for lineno, times in line_time.items()
+        }
+
+    def _start_monitoring(self) -> bool:
+        monitoring = sys.monitoring
+        tool_id = monitoring.PROFILER_ID
+        try:
+            monitoring.use_tool_id(tool_id, "pyu")
+        except ValueError:
+            # Another profiler (or an outer ltimer) holds the tool id
+            return False
+
+        # Everything the callback touches is bound as a default argument
+        # so each lookup is a LOAD_FAST
+        def _line(
+            code,
+            lineno: int,
+            _add_lineno=self._linenos.append,
+            _add_delta=self._deltas.append,
+            _perf_counter=time.perf_counter_ns,
+            _state=self._state,
+            _get_ident=threading.get_ident,
+            _thread_id=threading.get_ident(),
+        ):
+            if _get_ident() != _thread_id:
+                # Not DISABLE: that would silence the line in our thread
+                return None
+            current_time = _perf_counter()
+            _add_lineno(_state[0])
+            _add_delta(current_time - _state[1])
+            _state[0] = lineno
+            _state[1] = current_time
+
+        self._tool_id = tool_id
+        monitoring.register_callback(tool_id, monitoring.events.LINE, _line)
+        monitoring.set_local_events(
+            tool_id, self._root_code, monitoring.events.LINE
+        )
+        return True
+
+    def _start_settrace(self) -> None:
+        def _trace_lines(
+            frame,
+            event: str,
+            arg,
+            _add_lineno=self._linenos.append,
+            _add_delta=self._deltas.append,
+            _perf_counter=time.perf_counter_ns,
+            _state=self._state,
+        ):
+            if event != "line":
+                return _trace_lines
+            current_time = _perf_counter()
+            _add_lineno(_state[0])
+            _add_delta(current_time - _state[1])
+            _state[0] = frame.f_lineno
+            _state[1] = current_time
+            return _trace_lines
+
+        def _trace_calls(frame, event: str, arg, _root_code=self._root_code):
+            # Frames of other code get no local tracer, so none of their
+            # line events reach Python code
+            if frame.f_code is not _root_code:
+                return None
+            return _trace_lines
+
+        self._org_trace = sys.gettrace()
+        if self._root_frame is not None:
+            self._org_frame_trace = self._root_frame.f_trace
+            self._root_frame.f_trace = _trace_lines
+        sys.settrace(_trace_calls)
+
+
+class _CallTracer:
+    """
+    Collects the time spent in each Python function called while active.
+
+    ``sys.setprofile`` only reports calls and returns, so unlike line
+    tracing its cost does not grow with the number of lines executed.
+    C functions are not reported on their own; their time counts towards
+    the Python function calling them, as does the time of nested calls.
+    """
+
+    func_time: Dict[CodeType, List[int]]
+
+    def __init__(self):
+        self.func_time = defaultdict(list)
+        # (code, start time) of every call that has not returned yet
+        self._calls: List[Tuple[CodeType, int]] = []
+        self._org_profile = None
+
+    def start(self) -> None:
+        def _profile(
+            frame,
+            event: str,
+            arg,
+            _push=self._calls.append,
+            _pop=self._calls.pop,
+            _calls=self._calls,
+            _bucket=self.func_time.__getitem__,
+            _perf_counter=time.perf_counter_ns,
+        ):
+            if event == "call":
+                _push((frame.f_code, _perf_counter()))
+            elif event == "return" and _calls:
+                # Returns of frames entered before start find no call
+                code, start_time = _pop()
+                _bucket(code).append(_perf_counter() - start_time)
+
+        self._org_profile = sys.getprofile()
+        sys.setprofile(_profile)
+
+    def stop(self) -> Dict[Tuple[str, str, int], List[float]]:
+        """Stop profiling and return function times in seconds."""
+        sys.setprofile(self._org_profile)
+        func_time = defaultdict(list)
+        for code, times in self.func_time.items():
+            # Samples are kept in integer nanoseconds while profiling
+            func_time[
+                (code.co_filename, code.co_name, code.co_firstlineno)
+            ].extend(_ns_to_seconds(times))
+        return dict(func_time)
 
 
 class ltimer:
     _tracker: threading.local
     out: Any
     precision: int
+    append_mode: bool
     stats: Dict[Tuple[str, int, str], Stats]
 
-    def __init__(self, *, out: Any = None, precision: int = 4):
+    def __init__(
+        self,
+        *,
+        out: Any = None,
+        precision: int = 4,
+        append_mode: bool = False,
+    ):
         self._tracker = threading.local()
         self._tracker.running: Set[Callable] = set()
         self.out = out
         self.precision = precision
+        self.append_mode = append_mode
 
     def __call__(
         self,
         func: Optional[Callable] = None,
     ) -> Callable:
         """Decorator for measuring execution time of a function."""
+        _writer = TimeWriter(
+            self.out,
+            config=ReportConfig(precision=self.precision),
+            append_mode=self.append_mode,
+        )
+        # Resolved once here rather than by walking frames on every call
+        _code = _traced_code(func)
+
+        if _code is None:
+            # Builtins and other C callables run no Python lines, so there
+            # is nothing to trace; the call is timed as a whole instead
+            _note = (
+                f"No Python lines to trace in "
+                f"{getattr(func, '__qualname__', func)!s}; "
+                f"the call was timed as a whole"
+            )
+
+            @wraps(func)
+            def untraced(*args, **kwargs):
+                start_time = time.perf_counter_ns()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    elapsed = (time.perf_counter_ns() - start_time) / 1e9
+                    self.stats = {}
+                    _writer.with_func(func, *args, **kwargs).write(
+                        [elapsed], note=_note
+                    )
+
+            return untraced
 
         @wraps(func)
         def wrapper(*args, **kwargs):
@@ -108,121 +387,146 @@ class ltimer:
             if func in self._tracker.running:
                 return func(*args, **kwargs)
 
-            _line_time: Dict[int, List[float]] = defaultdict(list)
-            _org_trace = sys.gettrace()
-            _root_frame = sys._getframe(1)
-            _root_file = _root_frame.f_code.co_filename
-            _prev_line = None
-            _prev_time = time.perf_counter()
-            _last_line = None
-            _with_line = _root_frame.f_lineno
-
-            def _trace(frame, event: str, arg):
-                nonlocal _prev_line, _prev_time, _last_line
-                if event != "line":
-                    return _trace
-                current_time = time.perf_counter()
-                current_file = frame.f_code.co_filename
-                if current_file != _root_file:
-                    return _trace
-                if _prev_line is not None:
-                    _line_time[_prev_line].append(current_time - _prev_time)
-
-                filename = frame.f_code.co_filename
-                lineno = frame.f_lineno
-                _prev_line = (filename, lineno)
-                _prev_time = current_time
-
-                return _trace
-
+            tracer = _LineTracer(_code)
             try:
                 self._tracker.running.add(func)
-                _root_frame.f_trace = _trace
-                sys.settrace(_trace)
+                tracer.start()
                 return func(*args, **kwargs)
             finally:
-                if _prev_line is not None:
-                    end_time = time.perf_counter()
-                    _line_time[_prev_line].append(end_time - _prev_time)
-                _line_time = dict(
-                    filter(
-                        lambda item: item[0][1] != _with_line,
-                        _line_time.items(),
-                    )
-                )
+                _line_time = tracer.stop()
                 if func in self._tracker.running:
                     self._tracker.running.remove(func)
-                sys.settrace(_org_trace)
-                self.stats = {
-                    (
-                        linecache.getline(filename, lineno).strip(),
-                        lineno,
-                        filename,
-                    ): Stats(times)
-                    for ((filename, lineno), times) in _line_time.items()
-                }
-
-                TimeWriter(
-                    self.out, config=ReportConfig(precision=self.precision)
-                ).with_func(func, *args, **kwargs).write(
-                    _line_time, root_file=_root_file
+                self.stats = line_stats(_line_time)
+
+                _writer.with_func(func, *args, **kwargs).write(
+                    _line_time, root_file=tracer.root_file
                 )
 
         return wrapper
 
     def __enter__(self):
-        self._start_time: float = time.perf_counter()
-        self._line_time: Dict[int, List[float]] = defaultdict(list)
-        self._org_trace = sys.gettrace()
-        self._root_frame = sys._getframe(1)
-        self._root_file = self._root_frame.f_code.co_filename
-        self._prev_line = None
-        self._prev_time = time.perf_counter()
-        self._last_line = None
-        self._with_line = self._root_frame.f_lineno
-
-        def _trace(frame, event: str, arg):
-            if event != "line":
-                return _trace
-            current_time = time.perf_counter()
-            current_file = frame.f_code.co_filename
-            if current_file != self._root_file:
-                return _trace
-            if self._prev_line is not None:
-                self._line_time[self._prev_line].append(
-                    current_time - self._prev_time
-                )
+        # Only the code running the with block is traced, not the
+        # functions it calls
+        root_frame = sys._getframe(1)
+        self._tracer = _LineTracer(root_frame.f_code, root_frame)
+        self._tracer.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _line_time = self._tracer.stop()
+        self.stats = line_stats(_line_time)
+        TimeWriter(
+            self.out,
+            config=ReportConfig(precision=self.precision),
+            append_mode=self.append_mode,
+        ).write(_line_time, root_file=self._tracer.root_file)
+
+
+# Code ids of functions currently profiled by ftimer in this context,
+# used to let recursive calls run untraced
+_ftimer_running: ContextVar = ContextVar("_ftimer_running", default=())
+
+
+class ftimer:
+    """
+    Function-level time profiler.
+
+    Reports the time spent in every Python function called by the
+    decorated function or inside the ``with`` block, keyed by
+    ``(filename, function name, first line)``. Built on
+    ``sys.setprofile``, it is much cheaper than ``ltimer`` for code that
+    runs many lines.
+    """
+
+    out: Any
+    precision: int
+    append_mode: bool
+    stats: Dict[Tuple[str, str, int], Stats]
+
+    def __init__(
+        self,
+        *,
+        out: Any = None,
+        precision: int = 4,
+        append_mode: bool = False,
+    ):
+        self.out = out
+        self.precision = precision
+        self.append_mode = append_mode
+
+    def __call__(
+        self,
+        func: Optional[Callable] = None,
+    ) -> Callable:
+        """Decorator for measuring execution time of called functions."""
+        _writer = TimeWriter(
+            self.out,
+            config=ReportConfig(precision=self.precision),
+            append_mode=self.append_mode,
+        )
+        _key = id(getattr(func, "__code__", func))
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            running = _ftimer_running.get()
+            if _key in running:
+                return func(*args, **kwargs)
+            token = _ftimer_running.set(running + (_key,))
+            tracer = _CallTracer()
+            try:
+                tracer.start()
+                return func(*args, **kwargs)
+            finally:
+                _func_time = tracer.stop()
+                _ftimer_running.reset(token)
+                self.stats = _func_stats(_func_time)
 
-            filename = frame.f_code.co_filename
-            lineno = frame.f_lineno
-            self._prev_line = (filename, lineno)
-            self._prev_time = current_time
+                _writer.with_func(func, *args, **kwargs).write_functions(
+                    _func_time
+                )
 
-            return _trace
+        return wrapper
 
-        self._root_frame.f_trace = _trace
-        sys.settrace(_trace)
+    def __enter__(self):
+        self._tracer = _CallTracer()
+        self._tracer.start()
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
-        if self._prev_line is not None:
-            end_time = time.perf_counter()
-            self._line_time[self._prev_line].append(end_time - self._prev_time)
-        self._line_time = dict(
-            filter(
-                lambda item: item[0][1] != self._with_line,
-                self._line_time.items(),
-            )
-        )
-        self.stats = {
-            (
-                linecache.getline(filename, lineno).strip(),
-                lineno,
-                filename,
-            ): Stats(times)
-            for ((filename, lineno), times) in self._line_time.items()
-        }
+        _func_time = self._tracer.stop()
+        self.stats = _func_stats(_func_time)
         TimeWriter(
-            self.out, config=ReportConfig(precision=self.precision)
-        ).write(self._line_time, root_file=self._root_file)
-        sys.settrace(self._org_trace)
+            self.out,
+            config=ReportConfig(precision=self.precision),
+            append_mode=self.append_mode,
+        ).write_functions(_func_time)
+
+
+def _func_stats(
+    func_time: Dict[Tuple[str, str, int], List[float]],
+) -> Dict[Tuple[str, str, int], Stats]:
+    return {key: Stats(times) for key, times in func_time.items()}
+
+
+_C_CALLABLE_TYPES = (
+    BuiltinFunctionType,
+    MethodDescriptorType,
+    MethodWrapperType,
+    WrapperDescriptorType,
+)
+
+
+def _traced_code(func: Any) -> Optional[CodeType]:
+    """Code object a call of ``func`` runs, or None for C callables"""
+    func = inspect.unwrap(func)
+    if isinstance(func, partial):
+        return _traced_code(func.func)
+    code = getattr(func, "__code__", None)
+    if code is not None or isinstance(func, _C_CALLABLE_TYPES):
+        return code
+    if inspect.isclass(func):
+        # Instantiation runs ``__init__``, or ``__new__`` when only that
+        # one is written in Python
+        return _traced_code(func.__init__) or _traced_code(func.__new__)
+    call = getattr(type(func), "__call__", None)
+    return None if call is None else _traced_code(call)
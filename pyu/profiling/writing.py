@@ -13,16 +13,20 @@ import csv
 import inspect
 import io
 import linecache
+import math
+import operator
 import sys
 from abc import ABC, abstractmethod
 from contextlib import contextmanager
 from dataclasses import dataclass, field
 from enum import Enum
+from functools import lru_cache
 from pathlib import Path
 from typing import (
     Any,
     Callable,
     Dict,
+    Iterable,
     List,
     Optional,
     Protocol,
@@ -31,10 +35,8 @@ from typing import (
     Union,
 )
 
-from rich.console import Console
-from rich.table import Table
-
 from .exceptions import DataValidationError, InvalidOutputError
+from .stats import Stats
 
 # #######################
 # Configuration and Enums
@@ -87,10 +89,16 @@ class MetricData(Protocol):
 
 
 def validate_measurement_data(
-    data: Union[List[float], Dict[Any, List[float]]],
+    data: Union[List[float], Stats, Dict[Any, List[float]]],
 ) -> None:
     """Validate measurement data before processing"""
-    if isinstance(data, list):
+    if isinstance(data, Stats):
+        # Extremes are tracked as values are added, no need to rescan
+        if data.count and data.min < 0:
+            raise DataValidationError(
+                "All measurements must be non-negative numbers"
+            )
+    elif isinstance(data, list):
         if not data:
             return
         if not all(isinstance(x, (int, float)) and x >= 0 for x in data):
@@ -112,39 +120,37 @@ def validate_measurement_data(
         )
 
 
-def compute_statistics(data: List[float]) -> Dict[str, float]:
-    """Compute basic statistics for a list of numbers."""
+def compute_statistics(
+    data: Union[List[float], Stats],
+) -> Dict[str, float]:
+    """
+    Compute basic statistics for a list of numbers. Lists are wrapped in
+    a Stats accumulator, so both inputs share one implementation and the
+    moments of a Stats filled by ``add`` are reused as they are.
+    """
     if not data:
         return {}
 
-    sorted_data = sorted(data)
-    mean = sum(data) / len(data)
-
+    if not isinstance(data, Stats):
+        data = Stats(data)
     return {
-        "mean": mean,
-        "median": sorted_data[len(sorted_data) // 2],
-        "stdev": (
-            (
-                sum((x - mean) ** 2 for x in sorted_data)
-                / (len(sorted_data) - 1)
-            )
-            ** 0.5
-            if len(data) > 1
-            else 0.0
-        ),
-        "iqr": (
-            sorted_data[int(0.75 * len(sorted_data))]
-            - sorted_data[int(0.25 * len(sorted_data))]
-            if len(sorted_data) > 1
-            else 0.0
-        ),
-        "min": min(data),
-        "max": max(data),
-        "count": len(data),
-        "sum": sum(data),
+        "mean": data.mean,
+        "median": data.median,
+        "stdev": data.stddev,
+        "iqr": data.quantile(0.75) - data.quantile(0.25),
+        "min": data.min,
+        "max": data.max,
+        "count": data.count,
+        "sum": data.sum,
     }
 
 
+@lru_cache(maxsize=1024)
+def _cached_signature(func: Callable) -> inspect.Signature:
+    """Signature of a function, introspected once per function"""
+    return inspect.signature(func)
+
+
 def get_named_arguments(
     func: Callable,
     arguments: Optional[Tuple] = None,
@@ -156,28 +162,188 @@ def get_named_arguments(
     if kwargs is None:
         kwargs = {}
 
-    sig = inspect.signature(func)
+    try:
+        sig = _cached_signature(func)
+    except TypeError:
+        # Unhashable callables cannot be cached
+        sig = inspect.signature(func)
+    except ValueError:
+        # Some builtins expose no signature
+        return {"args": arguments, **kwargs}
     bound = sig.bind(*arguments, **kwargs)
     bound.apply_defaults()
     return dict(bound.arguments)
 
 
-def format_memory_unit(mem_bytes: float) -> str:
-    """Format memory bytes into appropriate unit"""
-    unit = "bytes"
-    conv = mem_bytes
+def get_code_lines(
+    keys: Iterable[Tuple[str, int]],
+) -> Dict[Tuple[str, int], str]:
+    """
+    Get source code for (filename, line_no) keys. Each file is read from
+    linecache once, and all lines are trimmed by the smallest indentation
+    among them.
+    """
+    sources: Dict[str, List[str]] = {}
+    code_lines = {}
+    for filename, line_no in keys:
+        lines = sources.get(filename)
+        if lines is None:
+            linecache.checkcache(filename)
+            lines = sources[filename] = linecache.getlines(filename)
+        code_lines[(filename, line_no)] = (
+            lines[line_no - 1].rstrip() if 0 < line_no <= len(lines) else ""
+        )
+
+    trim = min(
+        (
+            len(code) - len(code.lstrip())
+            for code in code_lines.values()
+            if code.strip()
+        ),
+        default=0,
+    )
+    return {key: code[trim:] for key, code in code_lines.items()}
+
+
+def line_stats(
+    line_values: Dict[Tuple[str, int], List[float]],
+) -> Dict[Tuple[str, int, str], Stats]:
+    """
+    Stats of each line keyed by (stripped code, line number, filename).
+    Sources come from ``get_code_lines``, so each file is read once.
+    """
+    code_lines = get_code_lines(line_values)
+    return {
+        (code_lines[key].strip(), key[1], key[0]): Stats(values)
+        for key, values in line_values.items()
+    }
+
+
+def sorted_by_line(
+    line_values: Dict[Tuple[str, int], List[float]],
+) -> List[Tuple[Tuple[str, int], List[float]]]:
+    """
+    Order line report items by line number. A report covers a single
+    file, so the int line number alone is the sort key.
+    """
+    return sorted(line_values.items(), key=_line_number)
+
+
+def _line_number(item: Tuple[Tuple[str, int], List[float]]) -> int:
+    return item[0][1]
+
+
+def line_columns(
+    line_values: Dict[Tuple[str, int], List[float]],
+) -> Tuple[List[int], List[str], List[float], List[float], List[int]]:
+    """
+    Columns of a line report in line order: line numbers, code, totals,
+    means and counts. Each column is built by one map over the sorted
+    items, so no per-row Python code runs.
+    """
+    items = sorted_by_line(line_values)
+    keys = list(map(operator.itemgetter(0), items))
+    values = list(map(operator.itemgetter(1), items))
+    totals = list(map(sum, values))
+    counts = list(map(len, values))
+    return (
+        list(map(operator.itemgetter(1), keys)),
+        list(map(get_code_lines(keys).__getitem__, keys)),
+        totals,
+        list(map(operator.truediv, totals, counts)),
+        counts,
+    )
+
+
+def format_line_time_rows(
+    line_times: Dict[Tuple[str, int], List[float]], precision: int
+) -> List[Tuple[str, str, str, str, str]]:
+    """Formatted (line no., code, total, mean, count) timing rows"""
+    line_nos, codes, totals, means, counts = line_columns(line_times)
+    # Bound once, instead of parsing a nested format spec for each cell
+    fmt = f"{{:.{precision}f}}".format
+    return list(
+        zip(
+            map(str, line_nos),
+            codes,
+            map(fmt, totals),
+            map(fmt, means),
+            map(str, counts),
+        )
+    )
+
+
+def format_line_memory_rows(
+    line_memory: Dict[Tuple[str, int], List[float]],
+) -> List[Tuple[str, str, str, str]]:
+    """Formatted (line no., code, mean, count) memory rows"""
+    line_nos, codes, _, means, counts = line_columns(line_memory)
+    return list(
+        zip(
+            map(str, line_nos),
+            codes,
+            map(format_memory_unit, means),
+            map(str, counts),
+        )
+    )
+
+
+def function_columns(
+    func_values: Dict[Tuple[str, str, int], List[float]],
+) -> Tuple[List[str], List[str], List[float], List[float], List[int]]:
+    """
+    Columns of a function report, largest total first: function names,
+    locations, totals, means and counts.
+    """
+    totals = dict(zip(func_values, map(sum, func_values.values())))
+    keys = sorted(totals, key=totals.__getitem__, reverse=True)
+    sorted_totals = list(map(totals.__getitem__, keys))
+    counts = list(map(len, map(func_values.__getitem__, keys)))
+    return (
+        [name for _, name, _ in keys],
+        [f"{filename}:{lineno}" for filename, _, lineno in keys],
+        sorted_totals,
+        list(map(operator.truediv, sorted_totals, counts)),
+        counts,
+    )
+
+
+def format_function_time_rows(
+    func_times: Dict[Tuple[str, str, int], List[float]], precision: int
+) -> List[Tuple[str, str, str, str, str]]:
+    """Formatted (function, location, total, mean, count) timing rows"""
+    names, locations, totals, means, counts = function_columns(func_times)
+    fmt = f"{{:.{precision}f}}".format
+    return list(
+        zip(
+            names,
+            locations,
+            map(fmt, totals),
+            map(fmt, means),
+            map(str, counts),
+        )
+    )
+
 
-    if conv > 2048:
-        conv = mem_bytes / 1024
-        unit = "kB"
-    if conv > 2048:
-        conv = conv / 1024
-        unit = "MB"
-    if conv > 2048:
-        conv = conv / 1024
-        unit = "GB"
+_FUNCTION_TIME_HEADERS = (
+    "Function",
+    "Location",
+    "Total Time (s)",
+    "Avg Time (s)",
+    "Count",
+)
+
+
+_MEMORY_UNITS = ("bytes", "kB", "MB", "GB")
 
-    return f"{conv:.2f} {unit}"
+
+def format_memory_unit(mem_bytes: float) -> str:
+    """Format memory bytes into appropriate unit"""
+    # A unit is used once the value exceeds 2048 of the unit below it,
+    # i.e. once ceil(mem_bytes) - 1 needs at least 12 + 10 * tier bits
+    tier = (max(math.ceil(mem_bytes) - 1, 0).bit_length() - 2) // 10
+    tier = min(len(_MEMORY_UNITS) - 1, max(0, tier))
+    return f"{mem_bytes / (1 << (10 * tier)):.2f} {_MEMORY_UNITS[tier]}"
 
 
 # ########################
@@ -185,26 +351,44 @@ def format_memory_unit(mem_bytes: float) -> str:
 # ########################
 
 
+def _stream_format(stream) -> OutputFormat:
+    # Rich layout is only worth its cost on an interactive terminal
+    if stream.isatty():
+        return OutputFormat.CONSOLE
+    return OutputFormat.TXT
+
+
 class OutputTarget:
     """Handles output destination and format detection"""
 
-    def __init__(self, target: Union[io.TextIOWrapper, str, Path, None]):
-        self.target, self.format = self._resolve_target_and_format(target)
-        self._should_close = False
-        self._file_handle = None
+    def __init__(
+        self,
+        target: Union[io.TextIOWrapper, str, Path, None],
+        append_mode: bool = False,
+    ):
+        # Each report replaces the file unless reports should accumulate
+        self._append_mode = append_mode
+        # Writers may outlive a redirection of sys.stderr, so the default
+        # target is looked up again on every write
+        self._follow_stderr = target is None
+        self.target, self._format = self._resolve_target_and_format(target)
+
+    @property
+    def format(self) -> OutputFormat:
+        """Output format, checked again for a redirected sys.stderr"""
+        if self._follow_stderr:
+            return _stream_format(sys.stderr)
+        return self._format
 
     def _resolve_target_and_format(
         self, target
     ) -> Tuple[Union[io.TextIOWrapper, Path], OutputFormat]:
         """Resolve target and determine output format"""
-        if target is None:
-            return sys.stderr, OutputFormat.CONSOLE
-        elif isinstance(target, io.TextIOWrapper):
-            return target, OutputFormat.CONSOLE
+        if target is None or isinstance(target, io.TextIOWrapper):
+            stream = sys.stderr if target is None else target
+            return stream, _stream_format(stream)
         elif isinstance(target, (str, Path)):
             path = Path(target)
-            path.parent.mkdir(exist_ok=True, parents=True)
-
             if path.suffix.lower() == ".csv":
                 return path, OutputFormat.CSV
             else:
@@ -217,9 +401,17 @@ class OutputTarget:
     @contextmanager
     def get_writer(self):
         """Get a writer for the output target"""
-        if self.format in {OutputFormat.CSV, OutputFormat.TXT}:
-            with self.target.open("w", encoding="utf-8") as f:
+        if isinstance(self.target, Path):
+            # Created on first write, not when a function is decorated
+            self.target.parent.mkdir(exist_ok=True, parents=True)
+            with self.target.open(
+                "a" if self._append_mode else "w",
+                encoding="utf-8",
+                newline="" if self.format is OutputFormat.CSV else None,
+            ) as f:
                 yield f
+        elif self._follow_stderr:
+            yield sys.stderr
         else:
             yield self.target
 
@@ -258,8 +450,9 @@ class BaseProfileWriter(ABC):
         self,
         output_target: Union[io.TextIOWrapper, str, Path, None] = None,
         config: ReportConfig = None,
+        append_mode: bool = False,
     ):
-        self._output = OutputTarget(output_target)
+        self._output = OutputTarget(output_target, append_mode=append_mode)
         self._config = config or ReportConfig()
         self._func: Optional[Callable] = None
         self._func_args: Dict[str, Any] = {}
@@ -285,7 +478,7 @@ class BaseProfileWriter(ABC):
 
     def write(
         self,
-        values: Union[List[float], Dict[Tuple[str, int], List[float]]],
+        values: Union[List[float], Stats, Dict[Tuple[str, int], List[float]]],
         **kwargs,
     ) -> None:
         """Write profiling data using appropriate formatter"""
@@ -304,6 +497,8 @@ class BaseProfileWriter(ABC):
             )
         else:
             content = formatter.format_simple_metrics(values, title)
+        if kwargs.get("note"):
+            content += f"{kwargs['note']}\n"
 
         with self._output.get_writer() as writer:
             writer.write(content)
@@ -323,12 +518,18 @@ class BaseProfileWriter(ABC):
 # Console Formatters
 # ##################
 
+# Rich is imported by the methods that render with it, so profiling code
+# that never writes a console report does not pay for importing it
+
 
 class ConsoleTimeFormatter(BaseFormatter):
     """Console formatter for timing data"""
 
     def format_simple_metrics(self, times: List[float], title: str) -> str:
         """Format timing data for console output"""
+        from rich.console import Console
+        from rich.table import Table
+
         console = Console(file=io.StringIO())
 
         if not times:
@@ -346,7 +547,7 @@ class ConsoleTimeFormatter(BaseFormatter):
 
             table.add_row(
                 "Total elapsed time",
-                f"{sum(times):.{self.config.precision}f} seconds over "
+                f"{stats['sum']:.{self.config.precision}f} seconds over "
                 f"{stats['count']} runs",
             )
             table.add_row(
@@ -385,6 +586,9 @@ class ConsoleTimeFormatter(BaseFormatter):
         root_file: str,
     ) -> str:
         """Format line-by-line timing data for console"""
+        from rich.console import Console
+        from rich.table import Table
+
         console = Console(file=io.StringIO())
         table = Table(title=f"{title} for code in file '{root_file}'")
         table.add_column("Line No.", style="cyan", no_wrap=True)
@@ -393,21 +597,33 @@ class ConsoleTimeFormatter(BaseFormatter):
         table.add_column("Avg Time (s)", style="magenta")
         table.add_column("Count", style="yellow")
 
-        leading_chars_trim = 0
-        for (filename, line_no), times in sorted(line_times.items()):
-            code_line = linecache.getline(filename, line_no)
-            if leading_chars_trim == 0:
-                leading_chars_trim = len(code_line) - len(code_line.lstrip())
-            code_line = code_line.rstrip()[leading_chars_trim:]
-            stats = compute_statistics(times)
+        for row in format_line_time_rows(line_times, self.config.precision):
+            table.add_row(*row)
 
-            table.add_row(
-                str(line_no),
-                code_line,
-                f"{stats['sum']:.{self.config.precision}f}",
-                f"{stats['mean']:.{self.config.precision}f}",
-                str(stats["count"]),
-            )
+        console.log(table)
+        return console.file.getvalue()
+
+    def format_function_metrics(
+        self,
+        func_times: Dict[Tuple[str, str, int], List[float]],
+        title: str,
+    ) -> str:
+        """Format per-function timing data for console"""
+        from rich.console import Console
+        from rich.table import Table
+
+        console = Console(file=io.StringIO())
+        table = Table(title=title)
+        table.add_column("Function", style="cyan", no_wrap=True)
+        table.add_column("Location", style="green")
+        table.add_column("Total Time (s)", style="magenta")
+        table.add_column("Avg Time (s)", style="magenta")
+        table.add_column("Count", style="yellow")
+
+        for row in format_function_time_rows(
+            func_times, self.config.precision
+        ):
+            table.add_row(*row)
 
         console.log(table)
         return console.file.getvalue()
@@ -420,6 +636,9 @@ class ConsoleMemoryFormatter(BaseFormatter):
         self, memory_usage: List[float], title: str
     ) -> str:
         """Format memory data for console output"""
+        from rich.console import Console
+        from rich.table import Table
+
         console = Console(file=io.StringIO())
 
         if not memory_usage:
@@ -469,6 +688,9 @@ class ConsoleMemoryFormatter(BaseFormatter):
         root_file: str,
     ) -> str:
         """Format line-by-line memory data for console"""
+        from rich.console import Console
+        from rich.table import Table
+
         console = Console(file=io.StringIO())
         table = Table(title=f"{title} for code in file '{root_file}'")
         table.add_column("Line No.", style="cyan", no_wrap=True)
@@ -476,25 +698,143 @@ class ConsoleMemoryFormatter(BaseFormatter):
         table.add_column("Avg Memory", style="magenta")
         table.add_column("Count", style="yellow")
 
-        leading_chars_trim = 0
-        for (filename, line_no), memory_values in sorted(line_memory.items()):
-            code_line = linecache.getline(filename, line_no)
-            if leading_chars_trim == 0:
-                leading_chars_trim = len(code_line) - len(code_line.lstrip())
-            code_line = code_line.rstrip()[leading_chars_trim:]
-            stats = compute_statistics(memory_values)
-
-            table.add_row(
-                str(line_no),
-                code_line,
-                format_memory_unit(stats["mean"]),
-                str(stats["count"]),
-            )
+        for row in format_line_memory_rows(line_memory):
+            table.add_row(*row)
 
         console.log(table)
         return console.file.getvalue()
 
 
+# #######################
+# Plain Text Formatters
+# #######################
+
+
+def format_plain_table(
+    title: str, headers: List[str], rows: List[Tuple[str, ...]]
+) -> str:
+    """Render rows as a fixed-width plain text table"""
+    widths = [
+        max([len(header)] + [len(row[i]) for row in rows])
+        for i, header in enumerate(headers)
+    ]
+    lines = [
+        title,
+        "  ".join(h.ljust(w) for h, w in zip(headers, widths)).rstrip(),
+        "  ".join("-" * w for w in widths),
+    ]
+    lines.extend(
+        "  ".join(c.ljust(w) for c, w in zip(row, widths)).rstrip()
+        for row in rows
+    )
+    return "\n".join(lines) + "\n"
+
+
+class TextTimeFormatter(BaseFormatter):
+    """
+    Plain text formatter for timing data. Used for files and streams
+    that are not a terminal, where Rich's markup and layout buy nothing.
+    """
+
+    def format_simple_metrics(self, times: List[float], title: str) -> str:
+        """Format timing data as plain text"""
+        if not times:
+            return "No timing data available.\n"
+        if len(times) == 1:
+            return (
+                f"Elapsed time: {times[0]:.{self.config.precision}f} seconds\n"
+            )
+
+        stats = compute_statistics(times)
+        precision = self.config.precision
+        rows = [
+            (
+                "Total elapsed time",
+                f"{stats['sum']:.{precision}f} seconds over "
+                f"{stats['count']} runs",
+            ),
+            ("Average time per run", f"{stats['mean']:.{precision}f} seconds"),
+            ("Standard deviation", f"{stats['stdev']:.{precision}f} seconds"),
+            ("Median time", f"{stats['median']:.{precision}f} seconds"),
+            (
+                "Interquartile range (IQR)",
+                f"{stats['iqr']:.{precision}f} seconds",
+            ),
+            ("Minimum time", f"{stats['min']:.{precision}f} seconds"),
+            ("Maximum time", f"{stats['max']:.{precision}f} seconds"),
+        ]
+        return format_plain_table(title, ["Metric", "Value"], rows)
+
+    def format_line_metrics(
+        self,
+        line_times: Dict[Tuple[str, int], List[float]],
+        title: str,
+        root_file: str,
+    ) -> str:
+        """Format line-by-line timing data as plain text"""
+        rows = format_line_time_rows(line_times, self.config.precision)
+        return format_plain_table(
+            f"{title} for code in file '{root_file}'",
+            [
+                "Line No.",
+                "Code",
+                "Total Time (s)",
+                "Avg Time (s)",
+                "Count",
+            ],
+            rows,
+        )
+
+    def format_function_metrics(
+        self,
+        func_times: Dict[Tuple[str, str, int], List[float]],
+        title: str,
+    ) -> str:
+        """Format per-function timing data as plain text"""
+        rows = format_function_time_rows(func_times, self.config.precision)
+        return format_plain_table(title, list(_FUNCTION_TIME_HEADERS), rows)
+
+
+class TextMemoryFormatter(BaseFormatter):
+    """Plain text formatter for memory data"""
+
+    def format_simple_metrics(
+        self, memory_usage: List[float], title: str
+    ) -> str:
+        """Format memory data as plain text"""
+        if not memory_usage:
+            return "No memory usage data available.\n"
+        if len(memory_usage) == 1:
+            return (
+                f"Total Memory Used: {format_memory_unit(memory_usage[0])}\n"
+            )
+
+        stats = compute_statistics(memory_usage)
+        rows = [
+            ("Average memory per run", format_memory_unit(stats["mean"])),
+            ("Standard deviation", format_memory_unit(stats["stdev"])),
+            ("Median memory", format_memory_unit(stats["median"])),
+            ("Interquartile range (IQR)", format_memory_unit(stats["iqr"])),
+            ("Minimum memory", format_memory_unit(stats["min"])),
+            ("Maximum memory", format_memory_unit(stats["max"])),
+        ]
+        return format_plain_table(title, ["Metric", "Value"], rows)
+
+    def format_line_metrics(
+        self,
+        line_memory: Dict[Tuple[str, int], List[float]],
+        title: str,
+        root_file: str,
+    ) -> str:
+        """Format line-by-line memory data as plain text"""
+        rows = format_line_memory_rows(line_memory)
+        return format_plain_table(
+            f"{title} for code in file '{root_file}'",
+            ["Line No.", "Code", "Avg Memory", "Count"],
+            rows,
+        )
+
+
 # ##############
 # CSV Formatters
 # ##############
@@ -508,28 +848,21 @@ class CSVTimeFormatter(BaseFormatter):
         output = io.StringIO()
         output.write(f"{title}\n\n")
 
-        headers = ["Metric", "Value"]
         stats = compute_statistics(times)
 
-        writer = csv.DictWriter(output, fieldnames=headers)
-        writer.writeheader()
+        writer = csv.writer(output)
+        writer.writerow(("Metric", "Value"))
         writer.writerows(
-            [
-                {"Metric": "Total elapsed time", "Value": sum(times)},
-                {"Metric": "Number of runs", "Value": len(times)},
-                {"Metric": "Average time", "Value": stats.get("mean", 0)},
-                {
-                    "Metric": "Standard deviation",
-                    "Value": stats.get("stdev", 0),
-                },
-                {"Metric": "Median time", "Value": stats.get("median", 0)},
-                {
-                    "Metric": "Interquartile range (IQR)",
-                    "Value": stats.get("iqr", 0),
-                },
-                {"Metric": "Minimum time", "Value": stats.get("min", 0)},
-                {"Metric": "Maximum time", "Value": stats.get("max", 0)},
-            ]
+            (
+                ("Total elapsed time", stats.get("sum", 0)),
+                ("Number of runs", stats.get("count", 0)),
+                ("Average time", stats.get("mean", 0)),
+                ("Standard deviation", stats.get("stdev", 0)),
+                ("Median time", stats.get("median", 0)),
+                ("Interquartile range (IQR)", stats.get("iqr", 0)),
+                ("Minimum time", stats.get("min", 0)),
+                ("Maximum time", stats.get("max", 0)),
+            )
         )
 
         return output.getvalue()
@@ -544,33 +877,32 @@ class CSVTimeFormatter(BaseFormatter):
         output = io.StringIO()
         output.write(f"{title} for code in file '{root_file}'\n\n")
 
-        headers = [
-            "Line No.",
-            "Code",
-            "Total Time (s)",
-            "Avg Time (s)",
-            "Count",
-        ]
-        writer = csv.DictWriter(output, fieldnames=headers)
-        writer.writeheader()
-
-        leading_chars_trim = 0
-        for (filename, line_no), times in sorted(line_times.items()):
-            stats = compute_statistics(times)
-            code_line = linecache.getline(filename, line_no)
-            if leading_chars_trim == 0:
-                leading_chars_trim = len(code_line) - len(code_line.lstrip())
-            code_line = code_line.rstrip()[leading_chars_trim:]
-
-            writer.writerow(
-                {
-                    "Line No.": line_no,
-                    "Code": code_line,
-                    "Total Time (s)": stats["sum"],
-                    "Avg Time (s)": stats["mean"],
-                    "Count": stats["count"],
-                }
+        writer = csv.writer(output)
+        writer.writerow(
+            (
+                "Line No.",
+                "Code",
+                "Total Time (s)",
+                "Avg Time (s)",
+                "Count",
             )
+        )
+        writer.writerows(zip(*line_columns(line_times)))
+
+        return output.getvalue()
+
+    def format_function_metrics(
+        self,
+        func_times: Dict[Tuple[str, str, int], List[float]],
+        title: str,
+    ) -> str:
+        """Format per-function timing data as CSV"""
+        output = io.StringIO()
+        output.write(f"{title}\n\n")
+
+        writer = csv.writer(output)
+        writer.writerow(_FUNCTION_TIME_HEADERS)
+        writer.writerows(zip(*function_columns(func_times)))
 
         return output.getvalue()
 
@@ -585,42 +917,20 @@ class CSVMemoryFormatter(BaseFormatter):
         output = io.StringIO()
         output.write(f"{title}\n\n")
 
-        headers = ["Metric", "Memory Usage (bytes)"]
         stats = compute_statistics(memory_usage)
 
-        writer = csv.DictWriter(output, fieldnames=headers)
-        writer.writeheader()
+        writer = csv.writer(output)
+        writer.writerow(("Metric", "Memory Usage (bytes)"))
         writer.writerows(
-            [
-                {
-                    "Metric": "Number of runs",
-                    "Memory Usage (bytes)": len(memory_usage),
-                },
-                {
-                    "Metric": "Average memory",
-                    "Memory Usage (bytes)": stats.get("mean", 0),
-                },
-                {
-                    "Metric": "Standard deviation",
-                    "Memory Usage (bytes)": stats.get("stdev", 0),
-                },
-                {
-                    "Metric": "Median memory",
-                    "Memory Usage (bytes)": stats.get("median", 0),
-                },
-                {
-                    "Metric": "Interquartile range (IQR)",
-                    "Memory Usage (bytes)": stats.get("iqr", 0),
-                },
-                {
-                    "Metric": "Minimum memory",
-                    "Memory Usage (bytes)": stats.get("min", 0),
-                },
-                {
-                    "Metric": "Maximum memory",
-                    "Memory Usage (bytes)": stats.get("max", 0),
-                },
-            ]
+            (
+                ("Number of runs", stats.get("count", 0)),
+                ("Average memory", stats.get("mean", 0)),
+                ("Standard deviation", stats.get("stdev", 0)),
+                ("Median memory", stats.get("median", 0)),
+                ("Interquartile range (IQR)", stats.get("iqr", 0)),
+                ("Minimum memory", stats.get("min", 0)),
+                ("Maximum memory", stats.get("max", 0)),
+            )
         )
 
         return output.getvalue()
@@ -635,33 +945,17 @@ class CSVMemoryFormatter(BaseFormatter):
         output = io.StringIO()
         output.write(f"{title} for code in file '{root_file}'\n\n")
 
-        headers = [
-            "Line No.",
-            "Code",
-            "Total Memory (bytes)",
-            "Avg Memory (bytes)",
-            "Count",
-        ]
-        writer = csv.DictWriter(output, fieldnames=headers)
-        writer.writeheader()
-
-        leading_chars_trim = 0
-        for (filename, line_no), memory_values in sorted(line_memory.items()):
-            stats = compute_statistics(memory_values)
-            code_line = linecache.getline(filename, line_no)
-            if leading_chars_trim == 0:
-                leading_chars_trim = len(code_line) - len(code_line.lstrip())
-            code_line = code_line.rstrip()[leading_chars_trim:]
-
-            writer.writerow(
-                {
-                    "Line No.": line_no,
-                    "Code": code_line,
-                    "Total Memory (bytes)": stats["sum"],
-                    "Avg Memory (bytes)": stats["mean"],
-                    "Count": stats["count"],
-                }
+        writer = csv.writer(output)
+        writer.writerow(
+            (
+                "Line No.",
+                "Code",
+                "Total Memory (bytes)",
+                "Avg Memory (bytes)",
+                "Count",
             )
+        )
+        writer.writerows(zip(*line_columns(line_memory)))
 
         return output.getvalue()
 
@@ -679,12 +973,26 @@ class TimeWriter(BaseProfileWriter):
         return {
             OutputFormat.CONSOLE: ConsoleTimeFormatter(self._config),
             OutputFormat.CSV: CSVTimeFormatter(self._config),
-            OutputFormat.TXT: ConsoleTimeFormatter(self._config),
+            OutputFormat.TXT: TextTimeFormatter(self._config),
         }
 
     def _get_metric_name(self) -> str:
         return "Timing"
 
+    def write_functions(
+        self, func_times: Dict[Tuple[str, str, int], List[float]]
+    ) -> None:
+        """Write timing data keyed by (filename, function name, line)"""
+        validate_measurement_data(func_times)
+
+        formatter = self._formatters[self._output.format]
+        content = formatter.format_function_metrics(
+            func_times, self._generate_title()
+        )
+
+        with self._output.get_writer() as writer:
+            writer.write(content)
+
 
 class MemoryWriter(BaseProfileWriter):
     """Writer for memory profiling data"""
@@ -694,7 +1002,7 @@ class MemoryWriter(BaseProfileWriter):
         return {
             OutputFormat.CONSOLE: ConsoleMemoryFormatter(self._config),
             OutputFormat.CSV: CSVMemoryFormatter(self._config),
-            OutputFormat.TXT: ConsoleMemoryFormatter(self._config),
+            OutputFormat.TXT: TextMemoryFormatter(self._config),
         }
 
     def _get_metric_name(self) -> str:
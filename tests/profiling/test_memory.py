@@ -170,6 +170,21 @@ class TestLineMemoryTracer:
             content = f.read()
             assert "Memory Usage Report" in content
 
+    def test_decorator_writes_to_file(self, tmp_path):
+        output_file = tmp_path / "line_memory_report.txt"
+
+        @lmem(out=output_file, append_mode=True)
+        def sample_function(size):
+            return _allocate(size)
+
+        sample_function(1024)
+        sample_function(2048)
+
+        content = output_file.read_text(encoding="utf-8")
+        # The first report holds a single run, the second both of them
+        assert content.startswith("Total Memory Used")
+        assert "Memory Usage Report for sample_function(size=2048)" in content
+
     def test_ordinary_use_as_context_manager_stdout(self, capsys):
         with lmem(out=sys.stdout) as lm:
             dummy_var = _allocate(4096)
@@ -241,3 +256,21 @@ class TestLineMemoryTracer:
         assert isinstance(stats, dict)
         for stat in stats.values():
             assert isinstance(stat, Stats)
+
+    def test_tracing_restored_on_error(self):
+        @lmem()
+        def failing_function():
+            data = [0] * 1000
+            raise RuntimeError(len(data))
+
+        org_trace = sys.gettrace()
+        with pytest.raises(RuntimeError):
+            failing_function()
+        assert sys.gettrace() is org_trace
+        assert sys._getframe().f_trace is None
+
+    def test_frame_trace_restored_context_manager(self):
+        with lmem():
+            data = [0] * 1000
+
+        assert sys._getframe().f_trace is None
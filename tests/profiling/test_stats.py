@@ -0,0 +1,92 @@
+import random
+
+import pytest
+
+from pyu.profiling.stats import Stats
+from tests.utils import assert_approx_equal
+
+
+class TestStats:
+
+    @pytest.mark.parametrize("size", [1, 2, 5, 100])
+    def test_incremental_matches_bulk(self, size):
+        values = [random.uniform(0.0, 10.0) for _ in range(size)]
+        incremental = Stats()
+        for value in values:
+            incremental.add(value)
+        bulk = Stats(list(values))
+
+        assert incremental.count == bulk.count == size
+        assert incremental.min == bulk.min == min(values)
+        assert incremental.max == bulk.max == max(values)
+        assert_approx_equal(incremental.sum, bulk.sum)
+        assert_approx_equal(incremental.mean, bulk.mean)
+        if size > 1:
+            assert_approx_equal(incremental.stddev, bulk.stddev)
+        else:
+            assert incremental.stddev == bulk.stddev == 0.0
+
+    def test_add_invalidates_cached_order_statistics(self):
+        stats = Stats([3.0, 1.0, 2.0])
+        assert stats.median == 2.0
+        stats.add(10.0)
+        assert stats.sorted_values == [1.0, 2.0, 3.0, 10.0]
+        assert stats.median == 2.5
+
+    def test_behaves_like_sequence(self):
+        stats = Stats()
+        stats.add(1.0)
+        stats.add(2.0)
+        assert len(stats) == 2
+        assert stats[0] == 1.0
+        assert list(stats) == [1.0, 2.0]
+        assert sum(stats) == 3.0
+
+    def test_quantile_interpolates_between_ranks(self):
+        stats = Stats([4.0, 1.0, 3.0, 2.0])
+        assert stats.quantile(0.0) == 1.0
+        assert stats.quantile(1.0) == 4.0
+        assert stats.quantile(0.5) == stats.median == 2.5
+        assert stats.quantile(0.25) == 1.75
+        assert stats.quantile(0.75) == 3.25
+
+    def test_quantile_of_single_value(self):
+        stats = Stats([7.0])
+        assert stats.quantile(0.25) == stats.quantile(0.75) == 7.0
+
+    def test_extend_matches_bulk(self):
+        values = [random.uniform(0.0, 10.0) for _ in range(50)]
+        merged = Stats()
+        merged.add(values[0])
+        merged.extend(values[1:20])
+        merged.extend(values[20:])
+        bulk = Stats(list(values))
+
+        assert merged.count == bulk.count == 50
+        assert merged.min == bulk.min
+        assert merged.max == bulk.max
+        assert merged.values == values
+        assert_approx_equal(merged.sum, bulk.sum)
+        assert_approx_equal(merged.mean, bulk.mean)
+        assert_approx_equal(merged.stddev, bulk.stddev)
+
+    def test_input_list_is_not_mutated(self):
+        values = [1.0, 2.0]
+        stats = Stats(values)
+        stats.add(3.0)
+        stats.extend([4.0])
+
+        assert values == [1.0, 2.0]
+        assert list(stats) == [1.0, 2.0, 3.0, 4.0]
+
+    def test_extend_with_nothing_keeps_stats(self):
+        stats = Stats([1.0, 2.0])
+        assert stats.median == 1.5
+        stats.extend([])
+        assert stats.count == 2
+        assert stats.median == 1.5
+
+    def test_bulk_sum_is_exactly_rounded(self):
+        stats = Stats([0.1] * 10)
+        assert stats.sum == 1.0
+        assert stats.mean == 0.1
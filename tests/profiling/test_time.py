@@ -5,7 +5,7 @@ from unittest.mock import patch
 import pytest
 
 from pyu.profiling.stats import Stats
-from pyu.profiling.time import ltimer, timer
+from pyu.profiling.time import ftimer, ltimer, timer
 
 
 def _assert_report_printed(output):
@@ -110,6 +110,71 @@ class TestTimeProfiling:
             content = f.read()
             _assert_report_printed(content)
 
+    def test_decorators_sharing_output_file(self, tmp_path):
+        output_file = tmp_path / "shared_report.txt"
+
+        @timer(out=output_file, repeat=5)
+        def first():
+            pass
+
+        @timer(out=output_file)
+        def second():
+            pass
+
+        first()
+        second()
+        first()
+
+        content = output_file.read_text(encoding="utf-8")
+        assert "\x00" not in content
+        last_report = content.rsplit("Timing Report for ", 1)[1]
+        assert last_report.startswith("first()")
+        assert "Total elapsed time" in last_report
+
+    def test_decorator_recreates_removed_report(self, tmp_path):
+        output_file = tmp_path / "report.txt"
+
+        @timer(out=output_file)
+        def sample_function():
+            pass
+
+        sample_function()
+        output_file.unlink()
+        sample_function()
+
+        assert "Timing Report for" in output_file.read_text(encoding="utf-8")
+
+    def test_decorator_overwrites_report_by_default(self, tmp_path):
+        output_file = tmp_path / "reports" / "line_report.txt"
+
+        @ltimer(out=output_file)
+        def sample_function(n):
+            return n * 2
+
+        assert not output_file.parent.exists()
+        sample_function(1)
+        sample_function(2)
+
+        content = output_file.read_text(encoding="utf-8")
+        assert content.count("Timing Report for") == 1
+        assert "sample_function(n=2)" in content
+
+    def test_decorator_append_mode_accumulates(self, tmp_path):
+        output_file = tmp_path / "line_report.txt"
+
+        @ltimer(out=output_file, append_mode=True)
+        def sample_function(n):
+            return n * 2
+
+        sample_function(1)
+        sample_function(2)
+
+        content = output_file.read_text(encoding="utf-8")
+        assert content.count("Timing Report for") == 2
+        assert content.index("sample_function(n=1)") < content.index(
+            "sample_function(n=2)"
+        )
+
     def test_raise_on_zero_repeats(self):
         with pytest.raises(ValueError, match="Repeat must be at least 1."):
 
@@ -378,3 +443,181 @@ class TestLineTimeProfiling:
         assert isinstance(stats, dict)
         for stat in stats.values():
             assert isinstance(stat, Stats)
+
+    def test_tracing_restored_on_error_context_manager(self):
+        org_trace = sys.gettrace()
+        with pytest.raises(RuntimeError):
+            with ltimer():
+                total = 0
+                raise RuntimeError(total)
+
+        assert sys.gettrace() is org_trace
+        assert sys._getframe().f_trace is None
+
+    @patch("pyu.profiling.writing.TimeWriter.write")
+    def test_builtin_function_is_timed_untraced(self, mock_time_writer_write):
+        t = ltimer()
+        timed_sleep = t(time.sleep)
+
+        timed_sleep(0.1)
+
+        elapsed = mock_time_writer_write.call_args.args[0]
+        assert len(elapsed) == 1
+        assert abs(elapsed[0] - 0.1) < TIME_MEASUREMENT_ATOL
+        assert t.stats == {}
+        note = mock_time_writer_write.call_args.kwargs["note"]
+        assert "No Python lines to trace in sleep" in note
+
+    def test_builtin_function_report_has_note(self, tmp_path):
+        out_file = tmp_path / "report.txt"
+        ltimer(out=out_file)(time.sleep)(0.01)
+
+        report = out_file.read_text()
+        assert "Elapsed time" in report
+        assert "No Python lines to trace in sleep" in report
+
+    @patch("pyu.profiling.writing.TimeWriter.write")
+    def test_class_init_is_traced(self, mock_time_writer_write):
+        class Point:
+            def __init__(self, x, y):
+                self.x = x
+                self.y = y
+
+        t = ltimer()
+        point = t(Point)(1, 2)
+
+        assert (point.x, point.y) == (1, 2)
+        assert len(t.stats) == 2
+        assert isinstance(mock_time_writer_write.call_args.args[0], dict)
+
+    @patch("pyu.profiling.writing.TimeWriter.write")
+    def test_callable_instance_is_traced(self, mock_time_writer_write):
+        class Adder:
+            def __call__(self, a, b):
+                return a + b
+
+        t = ltimer()
+
+        assert t(Adder())(1, 2) == 3
+        assert len(t.stats) == 1
+
+    @patch("pyu.profiling.writing.TimeWriter.write")
+    def test_other_threads_not_recorded(self, mock_time_writer_write):
+        import threading
+
+        def work(n, in_thread=False):
+            s = 0
+            if in_thread:
+                # The same code runs in another thread while profiled
+                thread = threading.Thread(target=work, args=(50,))
+                thread.start()
+                thread.join()
+            for i in range(n):
+                s += i
+            return s
+
+        t = ltimer()
+        t(work)(300, in_thread=True)
+
+        counts = {code: stat.count for (code, _, _), stat in t.stats.items()}
+        assert counts["s = 0"] == 1
+        assert counts["return s"] == 1
+        assert counts["s += i"] == 300
+
+
+def _leaf(n):
+    return sum(range(n))
+
+
+def _sleepy():
+    time.sleep(0.1)
+    return _leaf(10)
+
+
+class TestFunctionTimeProfiling:
+
+    def test_ordinary_use_as_context_manager_file(self, tmp_path):
+        output_file = tmp_path / "function_timing_report.txt"
+
+        with ftimer(out=output_file):
+            _sleepy()
+
+        with open(output_file, "r", encoding="utf-8") as f:
+            content = f.read()
+            assert "Timing Report" in content
+            assert "Function" in content
+            assert "Location" in content
+            assert "_sleepy" in content
+            assert "_leaf" in content
+
+    def test_ordinary_use_as_context_manager_default_output(self, capsys):
+        with ftimer():
+            _sleepy()
+
+        captured = capsys.readouterr()
+        assert "Timing Report" in captured.err
+        assert "_sleepy" in captured.err
+
+    @patch("pyu.profiling.writing.TimeWriter.write_functions")
+    def test_functions_keyed_by_code_location(self, mock_write_functions):
+        with ftimer():
+            for _ in range(3):
+                _leaf(100)
+
+        func_times = mock_write_functions.call_args.args[0]
+        key = (__file__, "_leaf", _leaf.__code__.co_firstlineno)
+        assert len(func_times[key]) == 3
+
+    @pytest.mark.skipif(
+        sys.platform == "darwin", reason="Timing on macOS is less reliable"
+    )
+    def test_nested_time_included(self):
+        t = ftimer()
+        with t:
+            _sleepy()
+
+        sleepy_key = (__file__, "_sleepy", _sleepy.__code__.co_firstlineno)
+        assert abs(t.stats[sleepy_key].sum - 0.1) < TIME_MEASUREMENT_ATOL
+
+    @patch("pyu.profiling.writing.TimeWriter.write_functions")
+    def test_recursive_function_decorator(self, mock_write_functions):
+        @ftimer()
+        def recursive_function(n):
+            if n <= 1:
+                return 1
+            else:
+
+                return n * recursive_function(n - 1)
+
+        result = recursive_function(5)
+        mock_write_functions.assert_called_once()
+        func_times = mock_write_functions.call_args.args[0]
+        counts = {
+            name: len(times) for (_, name, _), times in func_times.items()
+        }
+        assert counts["recursive_function"] == 5
+
+    @patch("pyu.profiling.writing.TimeWriter.write_functions")
+    def test_decorator_called_from_worker_thread(self, mock_write_functions):
+        from concurrent.futures import ThreadPoolExecutor
+
+        t = ftimer()
+        timed_leaf = t(_leaf)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            executor.submit(timed_leaf, 10).result()
+
+        mock_write_functions.assert_called_once()
+        assert "_leaf" in {name for (_, name, _) in t.stats}
+
+    def test_previous_profiler_restored(self):
+        def outer_profile(frame, event, arg):
+            pass
+
+        sys.setprofile(outer_profile)
+        try:
+            with ftimer():
+                _leaf(10)
+            assert sys.getprofile() is outer_profile
+        finally:
+            sys.setprofile(None)
@@ -0,0 +1,118 @@
+import io
+import sys
+
+import pytest
+
+from pyu.profiling.stats import Stats
+from pyu.profiling.writing import (
+    OutputFormat,
+    OutputTarget,
+    compute_statistics,
+    format_memory_unit,
+    get_code_lines,
+)
+
+
+class TestCodeLines:
+
+    def test_trim_uses_smallest_indentation(self, tmp_path):
+        source = tmp_path / "sample.py"
+        source.write_text(
+            "def outer():\n"
+            "    for i in range(3):\n"
+            "        total = i\n"
+            "    return total\n",
+            encoding="utf-8",
+        )
+        filename = str(source)
+
+        code_lines = get_code_lines([(filename, 3), (filename, 2)])
+
+        assert code_lines[(filename, 2)] == "for i in range(3):"
+        assert code_lines[(filename, 3)] == "    total = i"
+
+    def test_missing_line_is_empty(self, tmp_path):
+        source = tmp_path / "sample.py"
+        source.write_text("x = 1\n", encoding="utf-8")
+        filename = str(source)
+
+        code_lines = get_code_lines([(filename, 1), (filename, 5)])
+
+        assert code_lines[(filename, 1)] == "x = 1"
+        assert code_lines[(filename, 5)] == ""
+
+
+class TestFormatMemoryUnit:
+
+    @pytest.mark.parametrize(
+        "mem_bytes, expected",
+        [
+            (0, "0.00 bytes"),
+            (2048, "2048.00 bytes"),
+            (2048.5, "2.00 kB"),
+            (2049, "2.00 kB"),
+            (2048 * 1024, "2048.00 kB"),
+            (2048 * 1024 + 1, "2.00 MB"),
+            (2048 * 1024**2 + 1, "2.00 GB"),
+            (1024**5, "1048576.00 GB"),
+        ],
+    )
+    def test_unit_thresholds(self, mem_bytes, expected):
+        assert format_memory_unit(mem_bytes) == expected
+
+
+class TestComputeStatistics:
+
+    def test_list_and_incremental_stats_agree(self):
+        values = [0.4, 0.1, 0.3, 0.2, 0.5]
+        incremental = Stats()
+        for value in values:
+            incremental.add(value)
+
+        from_list = compute_statistics(values)
+        from_stats = compute_statistics(incremental)
+
+        assert from_list.keys() == from_stats.keys()
+        for key in from_list:
+            assert from_list[key] == pytest.approx(from_stats[key])
+        assert from_list["count"] == 5
+        assert from_list["min"] == 0.1
+        assert from_list["max"] == 0.5
+
+    def test_empty_data(self):
+        assert compute_statistics([]) == {}
+        assert compute_statistics(Stats()) == {}
+
+    def test_median_and_iqr_of_even_count(self):
+        stats = compute_statistics([4.0, 1.0, 3.0, 2.0])
+        assert stats["median"] == 2.5
+        assert stats["iqr"] == 1.5
+
+    def test_single_value(self):
+        stats = compute_statistics([0.5])
+        assert stats["median"] == 0.5
+        assert stats["iqr"] == 0.0
+        assert stats["stdev"] == 0.0
+
+
+class _Terminal(io.StringIO):
+    def isatty(self):
+        return True
+
+
+class TestOutputTarget:
+
+    def test_default_target_follows_redirected_stderr(self, monkeypatch):
+        monkeypatch.setattr(sys, "stderr", _Terminal())
+        target = OutputTarget(None)
+        assert target.format is OutputFormat.CONSOLE
+
+        redirected = io.StringIO()
+        monkeypatch.setattr(sys, "stderr", redirected)
+        assert target.format is OutputFormat.TXT
+        with target.get_writer() as writer:
+            assert writer is redirected
+
+    def test_file_target_is_plain_text(self, tmp_path):
+        target = OutputTarget(tmp_path / "report.txt")
+        assert target.format is OutputFormat.TXT